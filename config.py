@@ -7,9 +7,12 @@ A4布局系统配置模块
 from dataclasses import dataclass
 from typing import Dict, Any
 
-@dataclass
+@dataclass(slots=True, frozen=True)
 class LayoutConfig:
-    """布局配置类"""
+    """布局配置类
+    
+    不可变：铺排器在初始化时缓存配置值，修改配置请用 dataclasses.replace 生成新对象
+    """
     
     # A4页面尺寸 (基于CSS像素)
     page_width: int = 794          # A4宽度: 210mm
@@ -67,7 +70,7 @@ class LayoutConfig:
             'normal_page_lines': self.normal_page_lines
         }
 
-@dataclass
+@dataclass(slots=True, frozen=True)
 class HTMLConfig:
     """HTML生成配置类"""
     
@@ -1,14 +1,18 @@
 
 import asyncio
-from generate_page_screenshot import capture_first_page_screenshot
+from generate_page_screenshot import ScreenshotPool, capture_first_page_screenshot
 
 async def generate_png():
-    html_file = "A4_complete_5000words_demo.html"
-    output_file = "A4_complete_5000words_demo.png"
-    try:
-        await capture_first_page_screenshot(html_file, output_file)
-    except Exception as e:
-        print(f"Error generating screenshot: {e}")
+    jobs = [
+        ("A4_complete_5000words_demo.html", "A4_complete_5000words_demo.png"),
+    ]
+    # 所有截图共用一个浏览器
+    async with ScreenshotPool() as pool:
+        for html_file, output_file in jobs:
+            try:
+                await capture_first_page_screenshot(html_file, output_file, pool=pool)
+            except Exception as e:
+                print(f"Error generating screenshot: {e}")
 
 if __name__ == "__main__":
     asyncio.run(generate_png())
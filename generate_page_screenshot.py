@@ -5,44 +5,202 @@
 """
 
 import asyncio
+import base64
+from typing import List
+import aiofiles
+import aiofiles.os
 from playwright.async_api import async_playwright
 import os
 
-async def capture_first_page_screenshot(html_file_path: str, output_path: str = None):
-    """截取HTML文件第一页的截图
+# 截图用不到的资源类型，加载前直接拦截。字体会影响排版宽度，不拦截
+_BLOCKED_RESOURCE_TYPES = frozenset({"image", "media", "beacon", "websocket"})
+
+async def _block_unneeded_resources(route):
+    """拦截截图用不到的请求"""
+    if route.request.resource_type in _BLOCKED_RESOURCE_TYPES:
+        await route.abort()
+    else:
+        await route.continue_()
+
+class ScreenshotPool:
+    """截图浏览器池
     
-    Args:
-        html_file_path: HTML文件路径
-        output_path: 输出PNG路径，默认为同目录下的同名PNG文件
+    一个批次内共用同一个Chromium进程和BrowserContext，页面用完后放回池中复用，
+    避免每张截图都冷启动一次浏览器。信号量限制同时打开的页面数。
+    传入browser时在该浏览器上新建上下文，关闭池时不关闭这个浏览器。
+    每个页面的CDP会话也随页面一起缓存，快速截图时不必每次新建和断开。
     """
     
-    if not os.path.exists(html_file_path):
-        raise FileNotFoundError(f"HTML文件不存在: {html_file_path}")
+    def __init__(self, max_pages: int = 4, viewport: dict = None, browser=None):
+        self.max_pages = max_pages
+        # 设置页面尺寸（稍大一些以容纳页面周围的空白）
+        self.viewport = viewport or {"width": 1000, "height": 1400}
+        self._playwright = None
+        self._browser = browser
+        self._owns_browser = browser is None
+        self._context = None
+        self._idle_pages = []
+        self._cdp_sessions = {}
+        self._semaphore = asyncio.Semaphore(max_pages)
+        self._start_lock = asyncio.Lock()
     
-    if output_path is None:
-        output_path = html_file_path.replace('.html', '_page1.png')
+    async def _ensure_started(self):
+        """首次使用时启动浏览器"""
+        async with self._start_lock:
+            if self._context is None:
+                if self._browser is None:
+                    self._playwright = await async_playwright().start()
+                    self._browser = await self._playwright.chromium.launch(headless=True)
+                self._context = await self._browser.new_context(viewport=self.viewport)
+                await self._context.route("**/*", _block_unneeded_resources)
     
-    print(f"📸 开始截取页面截图...")
-    print(f"   HTML文件: {html_file_path}")
-    print(f"   输出文件: {output_path}")
+    async def acquire(self):
+        """取出一个页面，池中没有空闲页面时新建"""
+        await self._semaphore.acquire()
+        try:
+            await self._ensure_started()
+            while self._idle_pages:
+                page = self._idle_pages.pop()
+                if not page.is_closed():
+                    return page
+                self._cdp_sessions.pop(page, None)
+            return await self._context.new_page()
+        except BaseException:
+            self._semaphore.release()
+            raise
     
-    async with async_playwright() as p:
-        # 启动浏览器
-        browser = await p.chromium.launch(headless=True)
-        page = await browser.new_page()
-        
-        # 设置页面尺寸（稍大一些以容纳页面周围的空白）
-        await page.set_viewport_size({"width": 1000, "height": 1400})
-        
-        # 加载HTML文件
-        file_url = f"file://{os.path.abspath(html_file_path)}"
-        await page.goto(file_url)
+    async def release(self, page):
+        """归还页面，供下一次截图复用"""
+        if not page.is_closed():
+            self._idle_pages.append(page)
+        else:
+            self._cdp_sessions.pop(page, None)
+        self._semaphore.release()
+    
+    async def cdp_session(self, page):
+        """取页面的CDP会话，每个页面只在第一次使用时创建，之后一直复用到页面关闭"""
+        session = self._cdp_sessions.get(page)
+        if session is None:
+            session = await self._context.new_cdp_session(page)
+            self._cdp_sessions[page] = session
+        return session
+    
+    async def close(self):
+        """关闭所有页面和浏览器"""
+        if self._context is not None:
+            await self._context.close()
+        if self._owns_browser:
+            if self._browser is not None:
+                await self._browser.close()
+            if self._playwright is not None:
+                await self._playwright.stop()
+            self._playwright = self._browser = None
+        self._idle_pages.clear()
+        self._cdp_sessions.clear()
+        self._context = None
+    
+    async def __aenter__(self):
+        return self
+    
+    async def __aexit__(self, exc_type, exc, tb):
+        await self.close()
+
+async def _write_bytes(path: str, data: bytes):
+    """异步写文件，并发截图时不阻塞事件循环"""
+    async with aiofiles.open(path, 'wb') as f:
+        await f.write(data)
+
+# 元素在文档坐标系中的位置和尺寸：getBoundingClientRect相对视口，加上滚动偏移
+_DOCUMENT_RECT_JS = """el => {
+    const r = el.getBoundingClientRect();
+    return [r.x + window.scrollX, r.y + window.scrollY, r.width, r.height];
+}"""
+
+async def _capture_jpeg_cdp(cdp, element, out_path: str, quality: int = 90):
+    """直接调用CDP Page.captureScreenshot截取元素区域（JPEG，速度优先）
+    
+    绕过Playwright元素截图的额外布局查询往返，编码也比PNG快、文件更小。
+    每次截图只有两次往返：一次evaluate取文档坐标，一次CDP截图；会话由浏览器池复用。
+    """
+    x, y, width, height = await element.evaluate(_DOCUMENT_RECT_JS)
+    if not width or not height:
+        raise ValueError("页面元素(.page)不可见，无法截图")
+    
+    result = await cdp.send("Page.captureScreenshot", {
+        "format": "jpeg",
+        "quality": quality,
+        "optimizeForSpeed": True,
+        "captureBeyondViewport": True,
+        "clip": {
+            "x": x,
+            "y": y,
+            "width": width,
+            "height": height,
+            "scale": 1
+        }
+    })
+    
+    await _write_bytes(out_path, base64.b64decode(result["data"]))
+
+async def _load_html(page, html_path: str):
+    """在标签页中打开HTML文件并等待渲染就绪"""
+    # 加载HTML文件（静态页面，样式内联，DOM就绪即可，不必等网络空闲）
+    file_url = f"file://{os.path.abspath(html_path)}"
+    await page.goto(file_url, wait_until='domcontentloaded')
+    
+    # 等待字体加载完成（document.fonts.ready在字体就绪时立即返回，不再固定等待2秒）
+    await page.evaluate("async () => { await document.fonts.ready; }")
+
+async def _screenshot_element(pool: ScreenshotPool, page, element, out_path: str, fast: bool):
+    """截取单个页面元素"""
+    if fast:
+        await _capture_jpeg_cdp(await pool.cdp_session(page), element, out_path)
+    else:
+        await _write_bytes(out_path, await element.screenshot(type='png'))
+
+async def _set_html(page, html: str):
+    """直接把HTML字符串交给标签页渲染并等待字体就绪"""
+    await page.set_content(html, wait_until='domcontentloaded')
+    await page.evaluate("async () => { await document.fonts.ready; }")
+
+async def html_string_to_png(html: str, out_path: str, pool: ScreenshotPool, fast: bool = False) -> str:
+    """截取内存中HTML文档的第一页
+    
+    排版流水线已经拿到完整的HTML字符串时用它：省掉写盘、读盘和file://解析的往返。
+    页面样式全部内联，不依赖相对路径资源，set_content与打开文件渲染结果一致。
+    
+    Args:
+        html: 完整的HTML文档
+        out_path: 输出图片路径
+        pool: 截图浏览器池
+        fast: 为True时输出JPEG
+    """
+    page = await pool.acquire()
+    try:
+        await _set_html(page, html)
         
-        # 等待页面加载完成
-        await page.wait_for_load_state('networkidle')
+        first_page = await page.query_selector('.page')
+        if not first_page:
+            raise ValueError("未找到页面元素(.page)")
         
-        # 等待字体加载
-        await asyncio.sleep(2)
+        await _screenshot_element(pool, page, first_page, out_path, fast)
+    finally:
+        await pool.release(page)
+    
+    return out_path
+
+async def capture(html_path: str, out_path: str, pool: ScreenshotPool, fast: bool = False) -> str:
+    """用池中的页面截取HTML文件第一页
+    
+    Args:
+        html_path: HTML文件路径
+        out_path: 输出图片路径
+        pool: 截图浏览器池
+        fast: 为True时经CDP输出JPEG（更快、更小），否则输出无损PNG
+    """
+    page = await pool.acquire()
+    try:
+        await _load_html(page, html_path)
         
         # 查找第一个页面元素
         first_page = await page.query_selector('.page')
@@ -50,10 +208,139 @@ async def capture_first_page_screenshot(html_file_path: str, output_path: str =
             raise ValueError("未找到页面元素(.page)")
         
         # 截取第一页的截图
-        await first_page.screenshot(path=output_path, type='png')
+        await _screenshot_element(pool, page, first_page, out_path, fast)
+    finally:
+        await pool.release(page)
+    
+    return out_path
+
+async def capture_all_pages(html_path: str, out_dir: str, pool: ScreenshotPool,
+                            concurrency: int = 4, fast: bool = False) -> List[str]:
+    """并发截取HTML文件中的所有页面
+    
+    同一个标签页内的截图是串行的，所以开concurrency个标签页同时加载文档，
+    每个标签页各截一部分页面。实际并发数同时受浏览器池的页面上限约束。
+    
+    Args:
+        html_path: HTML文件路径
+        out_dir: 输出目录，文件名为 <HTML文件名>_page<页码>.png/.jpg
+        pool: 截图浏览器池
+        concurrency: 同时使用的标签页数
+        fast: 为True时输出JPEG
+        
+    Returns:
+        按页码排列的截图路径列表
+    """
+    if not await aiofiles.os.path.exists(html_path):
+        raise FileNotFoundError(f"HTML文件不存在: {html_path}")
+    await aiofiles.os.makedirs(out_dir, exist_ok=True)
+    
+    base_name = os.path.splitext(os.path.basename(html_path))[0]
+    extension = 'jpg' if fast else 'png'
+    
+    # 先统计页面数
+    page = await pool.acquire()
+    try:
+        await _load_html(page, html_path)
+        total_pages = len(await page.query_selector_all('.page'))
+    finally:
+        await pool.release(page)
+    
+    if total_pages == 0:
+        raise ValueError("未找到页面元素(.page)")
+    
+    output_paths = [
+        os.path.join(out_dir, f"{base_name}_page{i + 1}.{extension}") for i in range(total_pages)
+    ]
+    workers = max(1, min(concurrency, total_pages))
+    
+    async def _shot_worker(indices):
+        tab = await pool.acquire()
+        try:
+            await _load_html(tab, html_path)
+            elements = await tab.query_selector_all('.page')
+            for i in indices:
+                await _screenshot_element(pool, tab, elements[i], output_paths[i], fast)
+        finally:
+            await pool.release(tab)
+    
+    await asyncio.gather(*(_shot_worker(range(w, total_pages, workers)) for w in range(workers)))
+    
+    print(f"✅ 共截取 {total_pages} 页: {out_dir}")
+    return output_paths
+
+async def capture_many(html_files: List[str], out_dir: str, pool: ScreenshotPool = None,
+                       fast: bool = False) -> List[str]:
+    """连拍模式：在同一个标签页里依次截取多个HTML文件的第一页
+    
+    视口在浏览器池创建上下文时设置一次，之后每个文件只需导航、等字体、截图，
+    省去每次新建页面和设置视口的往返。
+    
+    Args:
+        html_files: HTML文件路径列表
+        out_dir: 输出目录，文件名为 <HTML文件名>_page1.png/.jpg
+        pool: 截图浏览器池；不传则临时启动浏览器
+        fast: 为True时输出JPEG
         
-        # 关闭浏览器
-        await browser.close()
+    Returns:
+        与html_files一一对应的截图路径列表
+    """
+    if pool is None:
+        async with ScreenshotPool(max_pages=1) as temp_pool:
+            return await capture_many(html_files, out_dir, temp_pool, fast=fast)
+    
+    await aiofiles.os.makedirs(out_dir, exist_ok=True)
+    extension = 'jpg' if fast else 'png'
+    output_paths = []
+    
+    page = await pool.acquire()
+    try:
+        for html_file in html_files:
+            if not await aiofiles.os.path.exists(html_file):
+                raise FileNotFoundError(f"HTML文件不存在: {html_file}")
+            
+            base_name = os.path.splitext(os.path.basename(html_file))[0]
+            out_path = os.path.join(out_dir, f"{base_name}_page1.{extension}")
+            
+            await _load_html(page, html_file)
+            first_page = await page.query_selector('.page')
+            if not first_page:
+                raise ValueError(f"未找到页面元素(.page): {html_file}")
+            
+            await _screenshot_element(pool, page, first_page, out_path, fast)
+            output_paths.append(out_path)
+    finally:
+        await pool.release(page)
+    
+    print(f"✅ 连拍完成: {len(output_paths)} 个文件 -> {out_dir}")
+    return output_paths
+
+async def capture_first_page_screenshot(html_file_path: str, output_path: str = None,
+                                        pool: ScreenshotPool = None, fast: bool = False):
+    """截取HTML文件第一页的截图
+    
+    Args:
+        html_file_path: HTML文件路径
+        output_path: 输出图片路径，默认为同目录下的同名PNG文件（fast模式为JPG）
+        pool: 截图浏览器池，批量截图时传入同一个池；不传则临时启动浏览器
+        fast: 为True时输出JPEG（CDP直接截图），默认输出PNG
+    """
+    
+    if not await aiofiles.os.path.exists(html_file_path):
+        raise FileNotFoundError(f"HTML文件不存在: {html_file_path}")
+    
+    if output_path is None:
+        output_path = html_file_path.replace('.html', '_page1.jpg' if fast else '_page1.png')
+    
+    print(f"📸 开始截取页面截图...")
+    print(f"   HTML文件: {html_file_path}")
+    print(f"   输出文件: {output_path}")
+    
+    if pool is None:
+        async with ScreenshotPool(max_pages=1) as temp_pool:
+            await capture(html_file_path, output_path, temp_pool, fast=fast)
+    else:
+        await capture(html_file_path, output_path, pool, fast=fast)
     
     print(f"✅ 截图完成: {output_path}")
     return output_path
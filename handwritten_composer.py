@@ -5,20 +5,164 @@
 模拟手写报告的逐行文字铺排过程
 """
 
+import logging
 import re
-from typing import Dict, List, Tuple, Any
-from dataclasses import dataclass
+import sys
+from bisect import bisect_right
+from collections import deque
+from functools import lru_cache
+from itertools import accumulate
+from typing import Deque, Dict, Iterable, List, Tuple, Any, Optional
+from dataclasses import dataclass, field
 from config import LayoutConfig
 from char_width import CharWidthCalculator
 
-@dataclass
+log = logging.getLogger(__name__)
+
+# 内容块类型（驻留字符串，解析器产生的块与这里共用同一个对象，比较时走指针相等的快速路径）
+_H1 = sys.intern('h1')
+_H2 = sys.intern('h2')
+_P = sys.intern('paragraph')
+_HEADING_BLOCK_TYPES = frozenset((_H1, _H2))
+
+@lru_cache(maxsize=65536)
+def _text_width_cached(char_calc: CharWidthCalculator, text: str, font_key: Tuple[str, str]) -> float:
+    """带缓存的文本宽度计算
+
+    同一文档内反复出现的词和子串只需计算一次；font_key 为 (字号, 字体)，
+    字体配置变化时自动使用新的缓存项。
+    """
+    return char_calc.get_text_width(text)
+
+# 不能出现在行首的标点（包含顿号）
+_PUNCT_CHARS = '.,;:!?):]}，。；：！？）：】》、'
+_PUNCT_SET = frozenset(_PUNCT_CHARS)
+_SPACE_OR_PUNCT_SET = _PUNCT_SET | {' '}
+# 英文单词边界字符
+_WORD_BOUNDARY_SET = frozenset(' .,;:!?()[]{}')
+
+@lru_cache(maxsize=256)
+def _boundary_mask(text: str) -> bytes:
+    """预先算出文本每个位置能否断开，1表示可以断开（多留一位表示文本末尾）
+    
+    中文字符处总能断开；英文在首尾、空格和标点的前后断开。
+    """
+    n = len(text)
+    mask = bytearray(n + 1)
+    prev = ''
+    for i, ch in enumerate(text):
+        if ch in _WORD_BOUNDARY_SET or prev in _WORD_BOUNDARY_SET or '\u4e00' <= ch <= '\u9fff':
+            mask[i] = 1
+        prev = ch
+    if n:
+        mask[0] = mask[n - 1] = 1
+    mask[n] = 1
+    return bytes(mask)
+
+# 段落分词正则：中文字符、空格、标点各自成词，其余连续字符（英文/数字）成一个词
+_TOKEN_RE = re.compile(
+    r'(?P<cjk>[\u4e00-\u9fff])'
+    r'|(?P<sp> )'
+    r'|(?P<punct>[%s])'
+    r'|(?P<word>[^ %s\u4e00-\u9fff]+)' % (re.escape(_PUNCT_CHARS), re.escape(_PUNCT_CHARS))
+)
+
+# 连字符断词用的词表，导入时构建一次
+_SPECIAL_HYPHEN = {  # 特殊单词的预定义分割点
+    'chatgpt': 4,     # chat-gpt
+    'artificial': 4,   # arti-ficial  
+    'intelligence': 5, # intel-ligence
+    'transformer': 5,  # trans-former
+    'deepmind': 4,     # deep-mind
+    'tensorflow': 6,   # tensor-flow
+    'pytorch': 2,      # py-torch
+    'machine': 2,      # ma-chine
+    'learning': 4,     # learn-ing
+    'neural': 3,       # neu-ral
+    'network': 3,      # net-work
+    'algorithm': 4,    # algo-rithm
+    'computer': 3,     # com-puter
+    'technology': 4,   # tech-nology
+    'development': 6,  # develop-ment
+    'processing': 4,   # proc-essing
+    'microsoft': 5,    # micro-soft
+    'general': 3,      # gen-eral
+    'system': 3,       # sys-tem
+    'language': 4,     # lang-uage
+    'natural': 3,      # nat-ural
+    'generation': 4,   # gene-ration
+    'foundation': 4,   # found-ation
+    'architecture': 5, # archi-tecture
+    'understanding': 5, # under-standing
+    'information': 2,  # in-formation
+    'application': 3,  # app-lication
+    'optimization': 4, # opti-mization
+    'integration': 4,  # inte-gration
+    'implementation': 2, # im-plementation
+    'classification': 5, # classi-fication
+    'interpretation': 6, # inter-pretation
+    'representation': 3, # rep-resentation
+    'communication': 3,  # com-munication
+    'recommendation': 3, # rec-ommendation
+}
+
+# 常见前缀/后缀
+_COMMON_PREFIXES = ('pre', 'pro', 'anti', 'auto', 'co', 'de', 'dis', 'en', 'em', 'fore', 'in', 'im', 'il', 'ir', 'inter', 'mid', 'mis', 'non', 'over', 'out', 'post', 're', 'semi', 'sub', 'super', 'trans', 'un', 'under')
+_COMMON_SUFFIXES = ('able', 'ible', 'al', 'ial', 'ed', 'en', 'er', 'est', 'ful', 'ic', 'ing', 'ion', 'tion', 'ation', 'ition', 'ity', 'ty', 'ive', 'ative', 'itive', 'less', 'ly', 'ment', 'ness', 'ous', 'eous', 'ious', 's', 'es', 'y')
+
+_TRIE_END = ''  # 词缀结束标记（不会与单个字符冲突）
+
+def _build_trie(affixes) -> dict:
+    """用嵌套字典构建词缀trie"""
+    root = {}
+    for affix in affixes:
+        node = root
+        for char in affix:
+            node = node.setdefault(char, {})
+        node[_TRIE_END] = True
+    return root
+
+def _longest_affix(trie: dict, text: str, max_len: int) -> int:
+    """沿trie匹配text开头，返回长度在2到max_len之间的最长词缀长度，没有则返回0"""
+    best = 0
+    node = trie
+    for depth, char in enumerate(text[:max_len], 1):
+        node = node.get(char)
+        if node is None:
+            break
+        if depth >= 2 and _TRIE_END in node:
+            best = depth
+    return best
+
+# 前缀trie；后缀trie建在反转的后缀上，匹配时从单词末尾往前走
+_PREFIX_TRIE = _build_trie(_COMMON_PREFIXES)
+_SUFFIX_TRIE = _build_trie(suffix[::-1] for suffix in _COMMON_SUFFIXES)
+
+# 专有名词和技术术语不应该被断开
+_PROTECTED_WORDS = frozenset({
+    'openai', 'google', 'deepmind', 'chatgpt', 'claude', 'bert',
+    'transformer', 'attention', 'multihead', 'alphafold', 'waymo',
+    'tesla', 'apollo', 'pytorch', 'tensorflow', 'nvidia', 'microsoft',
+    'artificial', 'intelligence', 'lamda', 'palm'
+})
+
+@dataclass(slots=True)
 class ContentBlock:
     """内容块数据结构"""
     type: str  # 'h1', 'h2', 'paragraph'
     text: str
     metadata: Dict[str, Any] = None
+    
+    # 以下字段只由铺排器在创建跨页续行段落时填写，调用方传入的块不会被修改
+    # 原段落的分词结果 (词列表, 词宽列表, 宽度前缀和)，续行段落沿用同一份
+    _tokens: Optional[tuple] = field(default=None, repr=False, compare=False)
+    # 分词结果对应的 (续行文本, 字宽计算器, 字体键)，与当前块和铺排器一致时分词结果才有效
+    _tokens_key: Optional[tuple] = field(default=None, repr=False, compare=False)
+    # 续行段落在分词结果中的起始位置：起始词索引 + 上一页留下的半个词
+    _start_idx: int = field(default=0, repr=False, compare=False)
+    _start_head: str = field(default="", repr=False, compare=False)
 
-@dataclass
+@dataclass(slots=True)
 class LayoutLine:
     """布局行数据结构"""
     text: str
@@ -28,7 +172,7 @@ class LayoutLine:
     line_number: int
     line_display: str = ""  # 行号显示文本
 
-@dataclass
+@dataclass(slots=True)
 class Page:
     """页面数据结构"""
     lines: List[LayoutLine]
@@ -42,9 +186,17 @@ class HandwrittenComposer:
     像人写字一样，一行一行写，一行写满就换行
     """
     
+    __slots__ = (
+        'config', 'char_calc', '_char_w', 'line_types',
+        'max_lines_per_page', 'first_page_lines',
+        '_full_w', '_indent', '_font_key',
+        'base_threshold', 'normal_tolerance', 'word_break_tolerance',
+    )
+    
     def __init__(self, layout_config: LayoutConfig = None, char_calculator: CharWidthCalculator = None):
         self.config = layout_config or LayoutConfig()
         self.char_calc = char_calculator or CharWidthCalculator()
+        self._char_w = {}  # 单字符宽度缓存
         
         # 行类型配置
         self.line_types = {
@@ -59,11 +211,27 @@ class HandwrittenComposer:
         self.max_lines_per_page = self.config.normal_page_lines  # 27行
         self.first_page_lines = self.config.first_page_lines    # 25行
         
+        # 热路径上反复读取的配置值（配置不可变，初始化时取一次）
+        self._full_w = self.config.text_area_width
+        self._indent = self.config.paragraph_indent
+        self._font_key = (self.config.font_size, self.config.font_family)
+        
         # 铺排参数 (严格控制溢出)
         self.base_threshold = 0.95     # 95%基准
         self.normal_tolerance = 0.98   # 98%普通容错
         self.word_break_tolerance = 0.99  # 99%拆词容错
     
+    def _text_width(self, text: str) -> float:
+        """获取文本宽度（带缓存）"""
+        return _text_width_cached(self.char_calc, text, self._font_key)
+    
+    def _char_width(self, char: str) -> float:
+        """获取单字符宽度（带缓存）"""
+        width = self._char_w.get(char)
+        if width is None:
+            width = self._char_w[char] = self.char_calc.get_char_width(char)
+        return width
+    
     def create_page_counter(self, page_number: int) -> List[int]:
         """创建页面行数倒序器"""
         max_lines = self.first_page_lines if page_number == 1 else self.max_lines_per_page
@@ -79,9 +247,9 @@ class HandwrittenComposer:
         Returns:
             行空间配置
         """
-        if block_type in ['h1', 'h2']:
+        if block_type in _HEADING_BLOCK_TYPES:
             return self.line_types[block_type].copy()
-        elif block_type == 'paragraph':
+        elif block_type == _P:
             if is_first_paragraph:
                 return self.line_types['paragraph_start'].copy()
             else:
@@ -91,105 +259,41 @@ class HandwrittenComposer:
     
     def is_word_boundary(self, text: str, pos: int) -> bool:
         """判断是否为单词边界"""
-        if pos >= len(text):
-            return True
-        
-        # 中文字符总是可以断开
-        if self.char_calc.classify_char(text[pos]) == 'chinese':
-            return True
-        
-        # 英文需要在单词边界断开
-        if pos == 0 or pos == len(text) - 1:
-            return True
-        
-        current_char = text[pos]
-        prev_char = text[pos - 1]
-        
-        # 空格、标点符号处可以断开
-        if current_char in ' .,;:!?()[]{}' or prev_char in ' .,;:!?()[]{}':
-            return True
-        
-        return False
+        return pos >= len(text) or _boundary_mask(text)[pos] == 1
     
     def find_best_break_point(self, text: str, max_chars: int) -> int:
         """寻找最佳断行点"""
         if max_chars >= len(text):
             return len(text)
         
-        # 从最大字符数向前搜索合适的断点
-        for i in range(max_chars, max(0, max_chars - 20), -1):
-            if self.is_word_boundary(text, i):
-                return i
+        # 从最大字符数向前最多搜索20个字符，找最近的边界
+        pos = _boundary_mask(text).rfind(1, max(0, max_chars - 20) + 1, max_chars + 1)
         
         # 如果找不到合适的断点，强制在最大位置断开
-        return max_chars
+        return pos if pos != -1 else max_chars
     
     def find_best_hyphen_position(self, word: str) -> int:
         """为长英文单词找到最佳连字符位置 - 基于音节和语法规则"""
         word_lower = word.lower()
         
         # 特殊单词的预定义分割点
-        special_words = {
-            'chatgpt': 4,     # chat-gpt
-            'artificial': 4,   # arti-ficial  
-            'intelligence': 5, # intel-ligence
-            'transformer': 5,  # trans-former
-            'deepmind': 4,     # deep-mind
-            'tensorflow': 6,   # tensor-flow
-            'pytorch': 2,      # py-torch
-            'machine': 2,      # ma-chine
-            'learning': 4,     # learn-ing
-            'neural': 3,       # neu-ral
-            'network': 3,      # net-work
-            'algorithm': 4,    # algo-rithm
-            'computer': 3,     # com-puter
-            'technology': 4,   # tech-nology
-            'development': 6,  # develop-ment
-            'processing': 4,   # proc-essing
-            'microsoft': 5,    # micro-soft
-            'general': 3,      # gen-eral
-            'system': 3,       # sys-tem
-            'language': 4,     # lang-uage
-            'natural': 3,      # nat-ural
-            'generation': 4,   # gene-ration
-            'foundation': 4,   # found-ation
-            'architecture': 5, # archi-tecture
-            'understanding': 5, # under-standing
-            'information': 2,  # in-formation
-            'application': 3,  # app-lication
-            'optimization': 4, # opti-mization
-            'integration': 4,  # inte-gration
-            'implementation': 2, # im-plementation
-            'classification': 5, # classi-fication
-            'interpretation': 6, # inter-pretation
-            'representation': 3, # rep-resentation
-            'communication': 3,  # com-munication
-            'recommendation': 3, # rec-ommendation
-        }
-        
-        if word_lower in special_words:
-            pos = special_words[word_lower]
+        pos = _SPECIAL_HYPHEN.get(word_lower)
+        if pos is not None:
             # 确保位置合理
             if 2 <= pos <= len(word) - 2:
                 return pos
         
         # 通用音节分割规则
-        vowels = 'aeiouAEIOU'
-        consonants = 'bcdfghjklmnpqrstvwxyzBCDFGHJKLMNPQRSTVWXYZ'
-        
         # 规则1：在复合词边界分割（如果有明显的词根）
-        common_prefixes = ['pre', 'pro', 'anti', 'auto', 'co', 'de', 'dis', 'en', 'em', 'fore', 'in', 'im', 'il', 'ir', 'inter', 'mid', 'mis', 'non', 'over', 'out', 'post', 're', 'semi', 'sub', 'super', 'trans', 'un', 'under']
-        common_suffixes = ['able', 'ible', 'al', 'ial', 'ed', 'en', 'er', 'est', 'ful', 'ic', 'ing', 'ion', 'tion', 'ation', 'ition', 'ity', 'ty', 'ive', 'ative', 'itive', 'less', 'ly', 'ment', 'ness', 'ous', 'eous', 'ious', 's', 'es', 'y']
-        
-        # 检查前缀
-        for prefix in sorted(common_prefixes, key=len, reverse=True):
-            if word_lower.startswith(prefix) and len(prefix) >= 2 and len(word) - len(prefix) >= 2:
-                return len(prefix)
+        # 检查前缀（取最长的匹配，且前后都至少留2个字符）
+        prefix_len = _longest_affix(_PREFIX_TRIE, word_lower, len(word) - 2)
+        if prefix_len:
+            return prefix_len
         
         # 检查后缀
-        for suffix in sorted(common_suffixes, key=len, reverse=True):
-            if word_lower.endswith(suffix) and len(suffix) >= 2 and len(word) - len(suffix) >= 2:
-                return len(word) - len(suffix)
+        suffix_len = _longest_affix(_SUFFIX_TRIE, word_lower[::-1], len(word) - 2)
+        if suffix_len:
+            return len(word) - suffix_len
         
         # 默认：在中间分割，但避免单字母
         best_pos = len(word) // 2
@@ -208,14 +312,7 @@ class HandwrittenComposer:
             return None
         
         # 专有名词和技术术语不应该被断开
-        protected_words = {
-            'openai', 'google', 'deepmind', 'chatgpt', 'claude', 'bert', 
-            'transformer', 'attention', 'multihead', 'alphafold', 'waymo',
-            'tesla', 'apollo', 'pytorch', 'tensorflow', 'nvidia', 'microsoft',
-            'artificial', 'intelligence', 'lamda', 'palm'
-        }
-        
-        if word.lower() in protected_words:
+        if word.lower() in _PROTECTED_WORDS:
             return None
             
         # 找到最佳连字符位置
@@ -225,7 +322,7 @@ class HandwrittenComposer:
         first_part = word[:hyphen_pos]
         first_part_with_hyphen = first_part + '-'
         
-        first_width = self.char_calc.get_text_width(first_part_with_hyphen)
+        first_width = self._text_width(first_part_with_hyphen)
         
         if first_width <= available_width:
             second_part = word[hyphen_pos:]
@@ -245,13 +342,13 @@ class HandwrittenComposer:
         Returns:
             (修正后的当前行, 修正后的剩余文本)
         """
-        if not text or not text[0] in '.,;:!?):]}，。；：！？）：】》、':
+        if not text or text[0] not in _PUNCT_SET:
             return text, text
         
         # 找到所有开头的标点符号
         punct_count = 0
         for char in text:
-            if char in '.,;:!?):]}，。；：！？）：】》、':
+            if char in _PUNCT_SET:
                 punct_count += 1
             else:
                 break
@@ -259,124 +356,148 @@ class HandwrittenComposer:
         # 返回需要移动的标点
         return text[:punct_count], text[punct_count:]
 
-    def fill_line_handwritten(self, text: str, line_config: Dict) -> Tuple[str, str, float, float]:
+    def _tokenize_paragraph(self, text: str) -> Tuple[List[str], List[float], List[float]]:
+        """段落分词 - 每个段落只分词、测宽一次
+
+        中文字符、空格、标点各自成词，连续的英文/数字成一个词。
+
+        Returns:
+            (词列表, 词宽列表, 宽度前缀和列表)，前缀和比词列表多一个起始0
+        """
+        words = [m.group() for m in _TOKEN_RE.finditer(text)]
+        widths = [self._text_width(word) for word in words]
+        cum_widths = list(accumulate(widths, initial=0.0))
+        return words, widths, cum_widths
+
+    def fill_line_handwritten(self, words: List[str], cum_widths: List[float], start_idx: int,
+                              indent: float, head: str = "") -> Tuple[str, str, int, float, float]:
         """手写式填充行 - 智能英文断字 + 避免段首标点版本
         
         Args:
-            text: 待填充文本
-            line_config: 行配置信息
+            words: 段落分词结果
+            cum_widths: 词宽前缀和
+            start_idx: 本行起始词索引
+            indent: 本行缩进
+            head: 上一行留下的半个词（断词剩余部分或移入的字符），排在start_idx之前
             
         Returns:
-            (当前行文本, 剩余文本, 实际宽度, 利用率)
+            (当前行文本, 下一行的半个词, 下一行起始词索引, 实际宽度, 利用率)
         """
-        max_width = self.config.text_area_width
-        indent = self.config.paragraph_indent if line_config['css_class'] == 'zw1' else 0.0
+        max_width = self._full_w
         available_width = max_width - indent
         
-        if not text.strip():
-            return "", "", indent, 0.0
+        if not head and start_idx >= len(words):
+            return "", "", start_idx, indent, 0.0
         
-        current_line = ""
+        # 本行 = 上一行留下的半个词 + words[start_idx:end_idx] + 断词得到的前半个词，
+        # 填充过程只记录下标，最后一次性拼接成字符串
+        head_part, tail_part = "", ""
+        end_idx = start_idx
         current_width = 0.0
-        pos = 0
-        words = []  # 记录单词信息，用于后续处理
-        
-        # 第一步：智能分词
-        i = 0
-        while i < len(text):
-            if self._is_chinese_char(text[i]):
-                # 中文字符单独处理
-                words.append({'text': text[i], 'type': 'chinese', 'start': i, 'end': i + 1})
-                i += 1
-            elif text[i] == ' ':
-                # 空格
-                words.append({'text': text[i], 'type': 'space', 'start': i, 'end': i + 1})
-                i += 1
-            elif text[i] in '.,;:!?):]}，。；：！？）：】》、':
-                # 标点符号（包含顿号）
-                words.append({'text': text[i], 'type': 'punctuation', 'start': i, 'end': i + 1})
-                i += 1
+        overflow_word = None  # 放不下的词
+        next_head = ""
+        
+        # 第一步：上一行留下的半个词
+        if head:
+            head_width = self._text_width(head)
+            if head_width > available_width:
+                overflow_word = next_head = head
             else:
-                # 英文单词或数字
-                word_start = i
-                while i < len(text) and text[i] not in ' .,;:!?):]}，。；：！？）：】》、' and not self._is_chinese_char(text[i]):
-                    i += 1
-                word_text = text[word_start:i]
-                words.append({'text': word_text, 'type': 'english', 'start': word_start, 'end': i})
-        
-        # 第二步：逐词填充
-        word_index = 0
-        while word_index < len(words):
-            word = words[word_index]
-            word_width = self.char_calc.get_text_width(word['text'])
-            
-            # 检查是否超出宽度
-            if current_width + word_width > available_width:
-                # 如果是长英文单词，尝试断词
-                if word['type'] == 'english' and len(word['text']) > 6:
-                    hyphen_result = self.try_hyphenate_word(word['text'], available_width - current_width)
-                    if hyphen_result:
-                        current_line += hyphen_result['fitted']
-                        current_width += hyphen_result['width']
-                        
-                        # 修改当前单词为剩余部分
-                        words[word_index]['text'] = hyphen_result['remaining']
-                        break
-                
-                # 不能断词，结束当前行
-                break
-            
-            current_line += word['text']
-            current_width += word_width
-            word_index += 1
+                head_part = head
+                current_width = head_width
+        
+        # 第二步：在前缀和上二分查找最后一个放得下的词
+        if overflow_word is None:
+            limit = cum_widths[start_idx] + available_width - current_width
+            end_idx = bisect_right(cum_widths, limit, start_idx) - 1
+            current_width += cum_widths[end_idx] - cum_widths[start_idx]
+            if end_idx < len(words):
+                overflow_word = words[end_idx]
+        next_idx = end_idx
+        
+        # 如果是长英文单词，尝试断词（中文、空格、标点都是单字符词）
+        hyphenated = False
+        if overflow_word is not None and len(overflow_word) > 6:
+            hyphen_result = self.try_hyphenate_word(overflow_word, available_width - current_width)
+            if hyphen_result:
+                tail_part = hyphen_result['fitted']
+                current_width += hyphen_result['width']
+                # 剩余部分作为下一行的半个词
+                if not next_head:
+                    next_idx += 1
+                next_head = hyphen_result['remaining']
+                hyphenated = True
         
         # 第三步：处理剩余文本和标点符号问题
-        remaining_text = ""
-        if word_index < len(words):
-            remaining_words = words[word_index:]
-            remaining_text = ''.join(w['text'] for w in remaining_words)
-            
-            # 检查剩余文本是否以标点开头
-            if remaining_text and remaining_text[0] in '.,;:!?):]}，。；：！？）：】》、':
-                # 找到当前行最后一个非空格、非标点的字符
-                for i in range(len(current_line) - 1, -1, -1):
-                    char = current_line[i]
-                    if char not in ' .,;:!?):]}，。；：！？）：】》、':
-                        # 将这个字符移到下一行
-                        move_char = current_line[i]
-                        current_line = current_line[:i] + current_line[i+1:]
-                        current_width -= self.char_calc.get_char_width(move_char)
-                        remaining_text = move_char + remaining_text
-                        break
-        
-        remaining_text = remaining_text.lstrip()
+        trim_idx = -1  # 末字符被移到下一行的词
+        next_char = next_head[:1] or (words[next_idx][:1] if next_idx < len(words) else "")
+        if not hyphenated and next_char in _PUNCT_SET:
+            # 找到当前行最后一个非空格、非标点的字符，将这个字符移到下一行。
+            # 词内不含空格和标点，所以只需找到最后一个非空格、非标点的词，取其末字符
+            for k in range(end_idx - 1, start_idx - 1, -1):
+                if words[k][-1] not in _SPACE_OR_PUNCT_SET:
+                    trim_idx = k
+                    move_char = words[k][-1]
+                    break
+            else:
+                move_char = head_part[-1:]
+                head_part = head_part[:-1]
+            if move_char:
+                current_width -= self._char_width(move_char)
+                next_head = move_char + next_head
+        
+        # 下一行不以空白开头
+        next_head = next_head.lstrip()
+        while not next_head and next_idx < len(words) and words[next_idx][:1].isspace():
+            next_head = words[next_idx].lstrip()
+            next_idx += 1
+        
+        if trim_idx < 0:
+            current_line = ''.join((head_part, ''.join(words[start_idx:end_idx]), tail_part))
+        else:
+            current_line = ''.join((head_part, ''.join(words[start_idx:trim_idx]), words[trim_idx][:-1],
+                                    ''.join(words[trim_idx + 1:end_idx]), tail_part))
         actual_width = current_width + indent
         utilization = actual_width / max_width if max_width > 0 else 0.0
         
-        return current_line, remaining_text, actual_width, utilization
-    
-    def _is_chinese_char(self, char: str) -> bool:
-        """判断是否为中文字符"""
-        return '\u4e00' <= char <= '\u9fff'
+        return current_line, next_head, next_idx, actual_width, utilization
     
-    def _is_break_point(self, text: str, pos: int) -> bool:
-        """判断是否为合适的断行点"""
-        if pos >= len(text):
-            return True
+    def _break_paragraph(self, words: List[str], cum_widths: List[float], first_indent: float,
+                         start_idx: int = 0, head: str = "") -> List[Tuple[int, str, str, float, float]]:
+        """一次扫描整段，算出段落的全部断行
         
-        # 在空格后断行
-        if pos > 0 and text[pos - 1] == ' ':
-            return True
+        按手写习惯逐行写满再换行。分页按固定行数计算，逐行写满同时也是
+        行数最少的断法；除末行外各行两端对齐，不需要再做松紧均衡。
         
-        # 在标点符号后断行
-        if pos > 0 and text[pos - 1] in '.,;:!?):]}':
-            return True
+        Args:
+            words: 段落分词结果
+            cum_widths: 词宽前缀和
+            first_indent: 首行缩进（续行段落为0）
+            start_idx: 起始词索引（续行段落从上一页断开处开始）
+            head: 起始处的半个词
+            
+        Returns:
+            每行的 (起始词索引, 起始半个词, 文本, 实际宽度, 利用率) 列表
+        """
+        breaks = []
+        indent = first_indent
         
-        # 在中文字符后总是可以断行
-        if pos > 0 and self._is_chinese_char(text[pos - 1]):
-            return True
+        while head or start_idx < len(words):
+            line_start = (start_idx, head)
+            
+            line_text, head, start_idx, actual_width, utilization = self.fill_line_handwritten(
+                words, cum_widths, start_idx, indent, head
+            )
+            
+            # If fill_line_handwritten returns an empty line and nothing is left,
+            # the paragraph is done.
+            if not line_text.strip() and not head and start_idx >= len(words):
+                break
+            
+            breaks.append((*line_start, line_text, actual_width, utilization))
+            indent = 0.0
         
-        return False
+        return breaks
     
     def compose_block(self, block: ContentBlock, start_line_number: int) -> Tuple[List[LayoutLine], int]:
         """铺排单个内容块
@@ -391,16 +512,17 @@ class HandwrittenComposer:
         lines = []
         current_line_number = start_line_number
         
-        if block.type in ['h1', 'h2']:
+        block_type = block.type
+        if block_type in _HEADING_BLOCK_TYPES:
             # 标题本身就是72px高度，占用2行空间
-            line_config = self.create_line_space(block.type)
+            line_config = self.create_line_space(block_type)
             
             # 标题行（本身就是72px，占用2行计数）
             title_line = LayoutLine(
                 text=block.text,
                 css_class=line_config['css_class'],
-                width=self.char_calc.get_text_width(block.text),
-                utilization=self.char_calc.get_text_width(block.text) / self.config.text_area_width,
+                width=self._text_width(block.text),
+                utilization=self._text_width(block.text) / self._full_w,
                 line_number=current_line_number
             )
             # 为标题添加行号显示信息
@@ -409,110 +531,115 @@ class HandwrittenComposer:
             
             return lines, 2  # 消耗2行计数
         
-        elif block.type == 'paragraph':
-            # 段落逐行铺排
-            remaining_text = block.text.strip()
-            # 检查是否为续行段落
-            is_continuation = block.metadata and block.metadata.get('is_continuation', False)
-            is_first_line = not is_continuation  # 如果是续行段落，则不是第一行
-            lines_used = 0
-            
-            while remaining_text:
-                indent = self.config.paragraph_indent if is_first_line else 0.0
-                available_width = self.config.text_area_width - indent
-                is_last_line = self.char_calc.get_text_width(remaining_text) <= available_width
-                
-                if is_first_line:
-                    line_config = self.line_types['paragraph_start'].copy()
-                elif is_last_line:
-                    line_config = self.line_types['paragraph_end'].copy()
-                else:
-                    line_config = self.line_types['paragraph_continue'].copy()
-
-                line_text, remaining_text, actual_width, utilization = self.fill_line_handwritten(
-                    remaining_text, line_config
-                )
-                
-                if not line_text and not remaining_text:
-                    break
-                
-                # If fill_line_handwritten returns an empty line but there's still text,
-                # it means the remaining text is just whitespace. We can break.
-                if not line_text.strip() and remaining_text.strip() == "":
-                    break
-
-                layout_line = LayoutLine(
-                    text=line_text,
-                    css_class=line_config['css_class'],
-                    width=actual_width,
-                    utilization=utilization,
-                    line_number=current_line_number + lines_used
-                )
-                # 为正文添加行号显示信息
-                layout_line.line_display = str(current_line_number + lines_used)
-                lines.append(layout_line)
-                
-                lines_used += 1
-                is_first_line = False
-
-            # Final check to update the last line's class to zw3 if it wasn't caught
-            if lines and lines[-1].css_class not in ['bt1', 'bt2', 'zw3']:
-                lines[-1].css_class = 'zw3'
-            
-            return lines, lines_used
+        elif block_type == _P:
+            # 段落逐行铺排（整段只分词一次，一次扫描算出全部断行）
+            lines, _, _ = self._compose_paragraph(block, current_line_number)
+            return lines, len(lines)
         
         else:
             raise ValueError(f"未知的内容块类型: {block.type}")
     
-    def compose_page(self, content_blocks: List[ContentBlock], page_number: int) -> Tuple[Page, List[ContentBlock]]:
+    def _compose_paragraph(self, block: ContentBlock, start_line_number: int
+                           ) -> Tuple[List[LayoutLine], tuple, List[Tuple[int, str]]]:
+        """铺排段落块
+        
+        Returns:
+            (布局行列表, 分词结果, 每行在分词结果中的起始位置)
+        """
+        lines = []
+        current_line_number = start_line_number
+        
+        # 只有铺排器自己创建、且与当前文本和字宽设置一致的续行段落才沿用分词结果
+        if block._tokens is not None and block._tokens_key == (block.text, self.char_calc, self._font_key):
+            tokens = block._tokens
+            start_idx, start_head = block._start_idx, block._start_head
+        else:
+            tokens = self._tokenize_paragraph(block.text.strip())
+            start_idx, start_head = 0, ""
+        words, widths, cum_widths = tokens
+        # 检查是否为续行段落
+        is_continuation = block.metadata and block.metadata.get('is_continuation', False)
+        first_indent = 0.0 if is_continuation else self._indent
+        breaks = self._break_paragraph(words, cum_widths, first_indent, start_idx, start_head)
+        line_starts = [(idx, head) for idx, head, *_ in breaks]
+        lines_used = 0
+        
+        for _, _, line_text, actual_width, utilization in breaks:
+            is_first_line = lines_used == 0 and not is_continuation  # 续行段落没有首行
+            is_last_line = lines_used == len(breaks) - 1
+            # 末行优先：只有一行的段落按末行（左对齐）处理
+            if is_last_line:
+                line_config = self.line_types['paragraph_end'].copy()
+            elif is_first_line:
+                line_config = self.line_types['paragraph_start'].copy()
+            else:
+                line_config = self.line_types['paragraph_continue'].copy()
+
+            layout_line = LayoutLine(
+                text=line_text,
+                css_class=line_config['css_class'],
+                width=actual_width,
+                utilization=utilization,
+                line_number=current_line_number + lines_used
+            )
+            # 为正文添加行号显示信息
+            layout_line.line_display = str(current_line_number + lines_used)
+            lines.append(layout_line)
+            
+            lines_used += 1
+
+        return lines, tokens, line_starts
+    
+    def compose_page(self, content_blocks: Iterable[ContentBlock], page_number: int) -> Tuple[Page, Deque[ContentBlock]]:
         """铺排单页内容
         
         Args:
-            content_blocks: 内容块列表
+            content_blocks: 待处理内容块队列（传入列表时复制为队列，不修改原列表）
             page_number: 页码
             
         Returns:
-            (页面对象, 剩余内容块)
+            (页面对象, 剩余内容块队列)
         """
+        queue = content_blocks if isinstance(content_blocks, deque) else deque(content_blocks)
         page_counter = self.create_page_counter(page_number)
         max_lines = len(page_counter)
         
         lines = []
         current_line_number = 1
-        block_index = 0
         
-        print(f"\n📄 开始铺排第{page_number}页 (最大{max_lines}行)")
-        print(f"🔢 行数倒序器: {page_counter[:5]}...{page_counter[-3:]}")
+        log.debug("\n📄 开始铺排第%d页 (最大%d行)", page_number, max_lines)
+        log.debug("🔢 行数倒序器: %s...%s", page_counter[:5], page_counter[-3:])
         
-        while block_index < len(content_blocks):
-            block = content_blocks[block_index]
+        while queue:
+            block = queue[0]
             
-            print(f"📝 处理内容块 [{block.type}]: '{block.text[:30]}...' (当前行号{current_line_number})")
+            log.debug("📝 处理内容块 [%s]: '%.30s...' (当前行号%d)", block.type, block.text, current_line_number)
             
             # 检查是否有足够空间放置这个块
-            if block.type in ['h1', 'h2']:
+            if block.type in _HEADING_BLOCK_TYPES:
                 # 标题必须完整放在一页，不能跨页
                 if current_line_number + 1 > max_lines:  # 标题需要2行，所以检查+1
-                    print(f"⚠️  标题空间不足，跳到下一页 (标题需要2行，当前行号{current_line_number})")
+                    log.debug("⚠️  标题空间不足，跳到下一页 (标题需要2行，当前行号%d)", current_line_number)
                     break
                 
                 # 铺排标题
                 block_lines, lines_used = self.compose_block(block, current_line_number)
                 lines.extend(block_lines)
                 current_line_number += lines_used
-                block_index += 1
-                print(f"✅ 标题完成铺排，使用了{lines_used}行，当前行号: {current_line_number}")
+                queue.popleft()
+                log.debug("✅ 标题完成铺排，使用了%d行，当前行号: %d", lines_used, current_line_number)
             
             else:  # paragraph - 可以跨页拆分
                 remaining_lines = max_lines - current_line_number + 1
-                print(f"   当前页剩余{remaining_lines}行空间")
+                log.debug("   当前页剩余%d行空间", remaining_lines)
                 
                 if remaining_lines <= 0:
-                    print(f"⚠️  页面已满，跳到下一页")
+                    log.debug("⚠️  页面已满，跳到下一页")
                     break
                 
                 # 铺排段落（可能只铺排部分内容）
-                block_lines, lines_used = self.compose_block(block, current_line_number)
+                queue.popleft()
+                block_lines, tokens, line_starts = self._compose_paragraph(block, current_line_number)
                 
                 # 检查是否所有行都能放入当前页
                 lines_that_fit = []
@@ -529,30 +656,29 @@ class HandwrittenComposer:
                     # 有部分内容可以放入当前页
                     lines.extend(lines_that_fit)
                     current_line_number += lines_consumed
-                    print(f"✅ 段落部分完成铺排，使用了{lines_consumed}行，当前行号: {current_line_number}")
+                    log.debug("✅ 段落部分完成铺排，使用了%d行，当前行号: %d", lines_consumed, current_line_number)
                     
                     # 如果段落还有剩余内容，创建新的段落块
                     if lines_consumed < len(block_lines):
-                        remaining_text = ""
-                        # 重新组合剩余的行内容
-                        for remaining_line in block_lines[lines_consumed:]:
-                            remaining_text += remaining_line.text
-                        
-                        # 更新当前块为剩余内容，标记为续行段落
-                        content_blocks[block_index] = ContentBlock(
-                            type='paragraph',
+                        # 更新当前块为剩余内容，标记为续行段落；
+                        # 沿用原段落的分词结果，从断开处继续，不重新分词。
+                        # 剩余文本直接取自分词结果（不含本页行尾的连字符）
+                        start_idx, head = line_starts[lines_consumed]
+                        remaining_text = head + ''.join(tokens[0][start_idx:])
+                        queue.appendleft(ContentBlock(
+                            type=_P,
                             text=remaining_text,
-                            metadata={'is_continuation': True}  # 标记为续行段落
-                        )
-                        print(f"📝 段落有剩余内容，将在下一页继续处理")
-                        # 不增加block_index，下一页继续处理这个块
-                    else:
-                        # 段落完全处理完成
-                        block_index += 1
+                            metadata={'is_continuation': True},  # 标记为续行段落
+                            _tokens=tokens,
+                            _tokens_key=(remaining_text, self.char_calc, self._font_key),
+                            _start_idx=start_idx,
+                            _start_head=head
+                        ))
+                        log.debug("📝 段落有剩余内容，将在下一页继续处理")
                 
                 # 如果当前页已满，跳到下一页
                 if current_line_number >= max_lines:
-                    print(f"📄 页面已满 (当前行号{current_line_number} >= 最大行数{max_lines})")
+                    log.debug("📄 页面已满 (当前行号%d >= 最大行数%d)", current_line_number, max_lines)
                     break
         
         # 创建页面对象
@@ -563,12 +689,10 @@ class HandwrittenComposer:
             remaining_lines=max_lines - len(lines)
         )
         
-        # 返回剩余的内容块
-        remaining_blocks = content_blocks[block_index:]
+        log.debug("📄 第%d页完成: %d行，剩余%d个内容块", page_number, len(lines), len(queue))
         
-        print(f"📄 第{page_number}页完成: {len(lines)}行，剩余{len(remaining_blocks)}个内容块")
-        
-        return page, remaining_blocks
+        # 返回剩余的内容块
+        return page, queue
     
     def compose_document(self, content_blocks: List[ContentBlock]) -> List[Page]:
         """铺排整个文档
@@ -579,34 +703,34 @@ class HandwrittenComposer:
         Returns:
             页面列表
         """
-        print("🖋️  开始手写报告铺排...")
-        print(f"📝 总计 {len(content_blocks)} 个内容块待处理")
+        log.debug("🖋️  开始手写报告铺排...")
+        log.debug("📝 总计 %d 个内容块待处理", len(content_blocks))
         
         pages = []
-        remaining_blocks = content_blocks.copy()
+        queue = deque(content_blocks)
         page_number = 1
         
-        while remaining_blocks:
-            page, remaining_blocks = self.compose_page(remaining_blocks, page_number)
+        while queue:
+            page, queue = self.compose_page(queue, page_number)
             pages.append(page)
             page_number += 1
             
             if page_number > 20:  # 防护措施
-                print("⚠️  页数过多，停止处理")
+                log.warning("⚠️  页数过多，停止处理")
                 break
         
-        print(f"✅ 手写报告铺排完成！")
-        print(f"📄 总页数: {len(pages)}")
-        print(f"📊 统计信息:")
+        log.debug("✅ 手写报告铺排完成！")
+        log.debug("📄 总页数: %d", len(pages))
+        log.debug("📊 统计信息:")
         for i, page in enumerate(pages, 1):
-            print(f"   第{i}页: {page.line_count}行，剩余空间{page.remaining_lines}行")
+            log.debug("   第%d页: %d行，剩余空间%d行", i, page.line_count, page.remaining_lines)
         
         return pages
 
 def test_handwritten_composer():
     """测试手写报告铺排器"""
     
-    print("🖋️  开始测试手写报告铺排器...")
+    log.info("🖋️  开始测试手写报告铺排器...")
     
     # 创建测试内容
     test_blocks = [
@@ -624,13 +748,14 @@ def test_handwritten_composer():
     pages = composer.compose_document(test_blocks)
     
     # 输出结果
-    print(f"\n📋 铺排结果详情:")
+    log.info("\n📋 铺排结果详情:")
     for page in pages:
-        print(f"\n📄 第{page.page_number}页:")
+        log.info("\n📄 第%d页:", page.page_number)
         for line in page.lines:
-            print(f"   第{line.line_number}行 [{line.css_class}]: '{line.text}' (宽度:{line.width:.1f}px, 利用率:{line.utilization:.1%})")
+            log.info("   第%d行 [%s]: '%s' (宽度:%.1fpx, 利用率:%.1f%%)", line.line_number, line.css_class, line.text, line.width, line.utilization * 100)
     
     return composer, pages
 
 if __name__ == "__main__":
+    logging.basicConfig(level=logging.DEBUG, format='%(message)s')
     test_handwritten_composer()
\ No newline at end of file
@@ -0,0 +1,82 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Markdown解析结果缓存
+按文件内容的SHA-256摘要把解析出的ContentBlock列表缓存到磁盘，
+源文件没有变化时跳过解析，直接读回上次的结果。
+"""
+
+import hashlib
+import os
+import pickle
+import sys
+from pathlib import Path
+from typing import List
+
+from handwritten_composer import ContentBlock
+from markdown_parser import MarkdownParser
+
+# 解析规则变化时改这个版本号，让旧缓存全部失效
+_CACHE_VERSION = b"3"
+# 缓存目录最多保留的条目数，超出时按写入先后淘汰最早的
+_MAX_ENTRIES = 4096
+
+def _cache_key(data: bytes) -> str:
+    """根据文件内容计算缓存键"""
+    return hashlib.sha256(_CACHE_VERSION + b"\0" + data).hexdigest()[:16]
+
+def _evict_oldest(cache_dir: Path):
+    """条目超出上限时删除最早写入的缓存（FIFO）"""
+    entries = list(cache_dir.glob("*.pkl"))
+    overflow = len(entries) - _MAX_ENTRIES
+    if overflow <= 0:
+        return
+    
+    entries.sort(key=lambda p: p.stat().st_mtime)
+    for entry in entries[:overflow]:
+        try:
+            entry.unlink()
+        except FileNotFoundError:
+            pass
+
+def parse_file_cached(path: str, cache_dir: Path = Path(".md-cache"),
+                      parser: MarkdownParser = None) -> List[ContentBlock]:
+    """
+    带缓存地解析Markdown文件。
+    
+    Args:
+        path: Markdown文件的路径。
+        cache_dir: 缓存目录，不存在时自动创建。
+        parser: 缓存未命中时使用的解析器，默认新建一个MarkdownParser。
+    
+    Returns:
+        一个包含ContentBlock对象的列表，与 MarkdownParser.parse_file 的结果相同。
+    """
+    data = Path(path).read_bytes()
+    cache_file = Path(cache_dir) / f"{_cache_key(data)}.pkl"
+    
+    try:
+        with open(cache_file, 'rb') as f:
+            blocks = pickle.load(f)
+        # 反序列化出来的类型字符串不是驻留对象，换回与解析器共用的那一份
+        for block in blocks:
+            block.type = sys.intern(block.type)
+        return blocks
+    except FileNotFoundError:
+        pass
+    except (pickle.UnpicklingError, EOFError, AttributeError, TypeError):
+        # 缓存文件损坏或与当前代码不兼容，重新解析并覆盖
+        pass
+    
+    parser = parser or MarkdownParser()
+    blocks = parser.parse_bytes(data)
+    
+    cache_file.parent.mkdir(parents=True, exist_ok=True)
+    # 先写临时文件再替换，避免并发运行时读到写了一半的缓存
+    tmp_file = cache_file.with_suffix(f".{os.getpid()}.tmp")
+    with open(tmp_file, 'wb') as f:
+        pickle.dump(blocks, f, protocol=pickle.HIGHEST_PROTOCOL)
+    os.replace(tmp_file, cache_file)
+    _evict_oldest(cache_file.parent)
+    
+    return blocks
@@ -5,9 +5,27 @@ Markdown解析器模块
 将Markdown文件解析为结构化的ContentBlock列表
 """
 
+import sys
 from typing import List
 from handwritten_composer import ContentBlock
 
+# 可选的Cython加速版本（python setup.py build_ext --inplace 编译），未编译时使用纯Python实现
+try:
+    from markdown_parser_fast import parse_lines_c
+except ImportError:
+    parse_lines_c = None
+
+# 内容块类型，驻留后所有块共用同一个字符串对象
+_H1 = sys.intern('h1')
+_H2 = sys.intern('h2')
+_P = sys.intern('paragraph')
+
+# 标题行前缀（### 及以上按普通段落处理），以及取标题文字时去掉的前缀字符
+_HEADING_PREFIXES = ('# ', '## ')
+_HEADING_MARKS = '# '
+# 分隔线，与空行、引用行 > 一样本身被忽略
+_RULE = '---'
+
 class MarkdownParser:
     """
     一个简单的Markdown解析器，用于将特定格式的Markdown文件
@@ -29,52 +47,88 @@ class MarkdownParser:
         Returns:
             一个包含ContentBlock对象的列表。
         """
-        with open(file_path, 'r', encoding='utf-8') as f:
-            lines = f.readlines()
+        # 二进制读取后一次性解码，跳过文本层的增量解码
+        with open(file_path, 'rb') as f:
+            data = f.read()
+        
+        return self.parse_bytes(data)
+
+    def parse_bytes(self, data: bytes) -> List[ContentBlock]:
+        """
+        解析UTF-8编码的Markdown文件内容。
+
+        Args:
+            data: 文件的原始字节。
+
+        Returns:
+            一个包含ContentBlock对象的列表。
+        """
+        text = data.decode('utf-8')
+        # 与文本模式读取一致：\r\n 和 \r 统一为 \n
+        if '\r' in text:
+            text = text.replace('\r\n', '\n').replace('\r', '\n')
         
-        return self.parse_lines(lines)
+        return self.parse_text(text)
+
+    def parse_text(self, text: str) -> List[ContentBlock]:
+        """
+        解析整篇Markdown文本。
+
+        Args:
+            text: Markdown全文（换行符为 \n）。
+
+        Returns:
+            一个包含ContentBlock对象的列表。
+        """
+        return self.parse_lines(text.split('\n'))
 
     def parse_lines(self, lines: List[str]) -> List[ContentBlock]:
         """
         解析一个字符串行列表。
 
+        逐行扫描：空行、分隔线和引用行结束当前段落，标题行单独成块，
+        其余行去掉首尾空白后放进段落缓冲区，段内换行合并为空格。
+        编译了Cython加速模块时交给 parse_lines_c，扫描规则相同。
+
         Args:
-            lines: 从文件中读取的行列表。
+            lines: 从文件中读取的行列表（行尾可以带换行符）。
 
         Returns:
             一个包含ContentBlock对象的列表。
         """
+        if parse_lines_c is not None:
+            return parse_lines_c(list(lines))
+        
         blocks: List[ContentBlock] = []
         paragraph_buffer: List[str] = []
-
-        def flush_paragraph_buffer():
-            """将段落缓冲区的内容打包成一个块并清空缓冲区。"""
-            if paragraph_buffer:
-                paragraph_text = "".join(paragraph_buffer).strip()
-                if paragraph_text:
-                    blocks.append(ContentBlock(type='paragraph', text=paragraph_text))
-                paragraph_buffer.clear()
+        append_block = blocks.append
+        append_line = paragraph_buffer.append
 
         for line in lines:
-            stripped_line = line.strip()
+            stripped = line.strip()
 
-            if not stripped_line or stripped_line == '---' or stripped_line.startswith('>'):
+            if not stripped or stripped == _RULE or stripped[0] == '>':
                 # 忽略空行、分隔线和引用行
-                flush_paragraph_buffer()
+                if paragraph_buffer:
+                    append_block(ContentBlock(type=_P, text=' '.join(paragraph_buffer)))
+                    paragraph_buffer.clear()
                 continue
 
-            if stripped_line.startswith('# '):
-                flush_paragraph_buffer()
-                blocks.append(ContentBlock(type='h1', text=stripped_line.lstrip('# ').strip()))
-            elif stripped_line.startswith('## '):
-                flush_paragraph_buffer()
-                blocks.append(ContentBlock(type='h2', text=stripped_line.lstrip('## ').strip()))
+            if stripped.startswith(_HEADING_PREFIXES):
+                if paragraph_buffer:
+                    append_block(ContentBlock(type=_P, text=' '.join(paragraph_buffer)))
+                    paragraph_buffer.clear()
+                append_block(ContentBlock(
+                    type=_H1 if stripped[1] == ' ' else _H2,
+                    text=stripped.lstrip(_HEADING_MARKS).strip()
+                ))
             else:
-                # 将非空行添加到段落缓冲区
-                paragraph_buffer.append(line)
+                # 缓冲区里的行都已去掉首尾空白且非空，合并时直接用空格连接
+                append_line(stripped)
         
         # 处理文件末尾可能存在的最后一个段落
-        flush_paragraph_buffer()
+        if paragraph_buffer:
+            append_block(ContentBlock(type=_P, text=' '.join(paragraph_buffer)))
 
         return blocks
 
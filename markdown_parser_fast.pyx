@@ -0,0 +1,75 @@
+# cython: language_level=3
+# -*- coding: utf-8 -*-
+"""
+Markdown解析器的Cython加速版本
+逐行扫描规则与 MarkdownParser.parse_lines 相同，局部变量使用C类型
+编译后 parse_file / parse_bytes / parse_text 自动改用这里的实现
+编译: python setup.py build_ext --inplace
+"""
+
+cimport cython
+from cpython.list cimport PyList_Append
+
+import sys
+
+from handwritten_composer import ContentBlock
+
+# 与 markdown_parser 中驻留的是同一个字符串对象，可以直接按引用比较
+_H1 = sys.intern('h1')
+_H2 = sys.intern('h2')
+_P = sys.intern('paragraph')
+
+cdef inline int _flush_paragraph(list blocks, list paragraph_buffer) except -1:
+    """将段落缓冲区的内容打包成一个块并清空缓冲区。"""
+    cdef str paragraph_text
+    if paragraph_buffer:
+        # 缓冲区里的行都已去掉首尾空白且非空，直接用空格连接
+        paragraph_text = " ".join(paragraph_buffer)
+        PyList_Append(blocks, ContentBlock(type=_P, text=paragraph_text))
+        del paragraph_buffer[:]
+    return 0
+
+@cython.boundscheck(False)
+@cython.wraparound(False)
+def parse_lines_c(list lines):
+    """
+    解析一个字符串行列表。
+
+    Args:
+        lines: 按换行符切分后的行列表（行尾可以带换行符）。
+
+    Returns:
+        一个包含ContentBlock对象的列表。
+    """
+    cdef list blocks = []
+    cdef list paragraph_buffer = []
+    cdef Py_ssize_t i
+    cdef Py_ssize_t n = len(lines)
+    cdef str line
+    cdef str stripped
+    cdef bint is_header
+
+    for i in range(n):
+        line = <str>lines[i]
+        stripped = line.strip()
+
+        if not stripped or stripped == '---' or stripped.startswith('>'):
+            # 忽略空行、分隔线和引用行
+            _flush_paragraph(blocks, paragraph_buffer)
+            continue
+
+        is_header = stripped.startswith('# ') or stripped.startswith('## ')
+        if is_header:
+            _flush_paragraph(blocks, paragraph_buffer)
+            PyList_Append(blocks, ContentBlock(
+                type=_H1 if stripped[1] == ' ' else _H2,
+                text=stripped.lstrip('# ').strip()
+            ))
+        else:
+            # 将去掉首尾空白的行添加到段落缓冲区
+            PyList_Append(paragraph_buffer, stripped)
+
+    # 处理文件末尾可能存在的最后一个段落
+    _flush_paragraph(blocks, paragraph_buffer)
+
+    return blocks
@@ -5,134 +5,137 @@ A4页面容器生成模块
 """
 
 from config import LayoutConfig, HTMLConfig
-from typing import List, Dict, Any
+from handwritten_composer import Page
+from typing import List, Dict, Any, Iterator
 from datetime import datetime
+from functools import lru_cache
+from string import Template
 
-class A4PageContainer:
-    """A4页面容器生成器"""
-    
-    def __init__(self, layout_config: LayoutConfig = None, html_config: HTMLConfig = None):
-        self.layout_config = layout_config or LayoutConfig()
-        self.html_config = html_config or HTMLConfig()
-        
-    def generate_css_styles(self) -> str:
-        """生成页面CSS样式"""
-        
-        css = f'''
-        * {{
+# CSS模板直接用到的配置字段
+_CSS_LAYOUT_FIELDS = (
+    'font_family', 'font_size', 'line_height', 'page_width', 'page_height',
+    'margin_left', 'margin_top', 'margin_right', 'margin_bottom',
+    'text_area_width', 'text_area_height', 'header_height', 'footer_height',
+    'title_color', 'paragraph_indent',
+)
+_CSS_HTML_FIELDS = ('background_color', 'page_shadow', 'show_page_borders', 'border_style', 'show_debug_info')
+
+# 页面CSS模板，${...} 处填入配置值
+_CSS_TEMPLATE = Template('''
+        * {
             margin: 0;
             padding: 0;
             box-sizing: border-box;
-        }}
+        }
         
-        body {{
-            font-family: {self.layout_config.font_family};
-            font-size: {self.layout_config.font_size};
-            line-height: {self.layout_config.line_height}px;
-            background-color: {self.html_config.background_color};
+        body {
+            font-family: ${font_family};
+            font-size: ${font_size};
+            line-height: ${line_height}px;
+            background-color: ${background_color};
             padding: 20px;
             color: #333;
-        }}
+        }
         
-        .page {{
-            width: {self.layout_config.page_width}px;
-            height: {self.layout_config.page_height}px;
+        .page {
+            width: ${page_width}px;
+            height: ${page_height}px;
             background-color: white;
             margin: 0 auto 20px auto;
-            box-shadow: {self.html_config.page_shadow};
+            box-shadow: ${page_shadow};
             position: relative;
             page-break-after: always;
-        }}
+        }
         
-        .text-area {{
+        .text-area {
             position: absolute;
-            left: {self.layout_config.margin_left}px;
-            top: {self.layout_config.margin_top}px;
-            width: {self.layout_config.text_area_width}px;
-            height: {self.layout_config.text_area_height}px;
-            font-size: {self.layout_config.font_size};
-            line-height: {self.layout_config.line_height}px;
+            left: ${margin_left}px;
+            top: ${margin_top}px;
+            width: ${text_area_width}px;
+            height: ${text_area_height}px;
+            font-size: ${font_size};
+            line-height: ${line_height}px;
             font-weight: normal;
-            border: {self.html_config.border_style if self.html_config.show_page_borders else 'none'};
-        }}
+            border: ${text_area_border};
+        }
         
-        .page-header {{
+        .page-header {
             position: absolute;
-            top: {self.layout_config.margin_top - 40}px;
-            left: {self.layout_config.margin_left}px;
-            right: {self.layout_config.margin_right}px;
-            height: {self.layout_config.header_height}px;
+            top: ${header_top}px;
+            left: ${margin_left}px;
+            right: ${margin_right}px;
+            height: ${header_height}px;
             text-align: center;
             font-size: 12pt;
             color: #666;
-            line-height: {self.layout_config.header_height}px;
-        }}
+            line-height: ${header_height}px;
+        }
         
-        .page-footer {{
+        .page-footer {
             position: absolute;
-            bottom: {self.layout_config.margin_bottom - 40}px;
-            left: {self.layout_config.margin_left}px;
-            right: {self.layout_config.margin_right}px;
-            height: {self.layout_config.footer_height}px;
+            bottom: ${footer_bottom}px;
+            left: ${margin_left}px;
+            right: ${margin_right}px;
+            height: ${footer_height}px;
             text-align: center;
             font-size: 10pt;
             color: #999;
-            line-height: {self.layout_config.footer_height}px;
-        }}
+            line-height: ${footer_height}px;
+        }
         
         /* 文本样式 */
-        .bt1 {{
+        .bt1 {
             margin: 0;
             padding: 0;
-            font-size: {self.layout_config.font_size};
-            font-family: {self.layout_config.font_family};
+            font-size: ${font_size};
+            font-family: ${font_family};
             font-weight: bold;
-            color: {self.layout_config.title_color};
+            color: ${title_color};
             height: 72px;
             line-height: 72px;
             text-align: left !important;
             text-align-last: left !important;
-        }}
+        }
         
         /* 标题样式 */
-        .bt1, .bt2 {{
+        .bt1, .bt2 {
             font-weight: bold;
-            color: {self.layout_config.title_color};
+            color: ${title_color};
             height: 72px;
             line-height: 72px;
             text-align: left !important;
             text-align-last: left !important;
-        }}
+        }
         
         /* 段落样式 */
-        .zw1, .zw2, .zw3 {{
+        .zw1, .zw2, .zw3 {
             font-weight: normal;
-            height: {self.layout_config.line_height}px;
-            line-height: {self.layout_config.line_height}px;
+            height: ${line_height}px;
+            line-height: ${line_height}px;
             text-align: justify;
             text-align-last: justify;  /* 确保最后一行也两端对齐 */
             word-spacing: 0.1em;       /* 增加单词间距以改善justify效果 */
             letter-spacing: 0.02em;    /* 轻微字符间距调整 */
-        }}
+        }
 
-        .zw1 {{
-            text-indent: {self.layout_config.paragraph_indent}px;
-        }}
+        .zw1 {
+            text-indent: ${paragraph_indent}px;
+        }
         
-        .zw2 {{
+        .zw2 {
             text-indent: 0;
-        }}
+        }
 
-        .zw3 {{
+        .zw3 {
             text-indent: 0;
             text-align: left !important;           /* 段落最后一行左对齐 */
             text-align-last: left !important;     /* 确保最后一行左对齐 */
             word-spacing: normal;                  /* 最后一行恢复正常间距 */
             letter-spacing: normal;               /* 最后一行恢复正常间距 */
-        }}
+        }
         
         /* 调试信息面板 */
-        .debug-info {{
+        .debug-info {
             position: fixed;
             top: 10px;
             right: 10px;
@@ -143,39 +146,97 @@ class A4PageContainer:
             font-size: 11px;
             z-index: 1000;
             max-width: 300px;
-            display: {'block' if self.html_config.show_debug_info else 'none'};
-        }}
+            display: ${debug_display};
+        }
         
         /* 打印样式 */
-        @media print {{
-            body {{ 
+        @media print {
+            body { 
                 background: white; 
                 padding: 0; 
-            }}
-            .page {{ 
+            }
+            .page { 
                 margin: 0; 
                 box-shadow: none; 
                 page-break-after: always;
-            }}
-            .text-area {{ 
+            }
+            .text-area { 
                 border: none; 
-            }}
-            .debug-info {{ 
+            }
+            .debug-info { 
                 display: none; 
-            }}
-        }}
-        '''
-        
-        return css
+            }
+        }
+        ''')
+
+# 文档开头的固定片段，中间依次填入标题、CSS
+_HEAD_OPEN = '''<!DOCTYPE html>
+<html lang="zh-CN">
+<head>
+    <meta charset="UTF-8">
+    <meta name="viewport" content="width=device-width, initial-scale=1.0">
+    <title>'''
+_HEAD_STYLE = '''</title>
+    <style>'''
+_HEAD_CLOSE = '''</style>
+</head>
+<body>
+'''
+
+# 单页HTML的前后两段，中间是页面内容
+_PAGE_PREFIX = '''
+    <!-- 第{n}页 -->
+    <div class="page">
+        <div class="page-header">{hdr}</div>
+        <div class="text-area">
+'''
+_PAGE_SUFFIX = '''        </div>
+        <div class="page-footer">第 {n} 页 | 共 {t} 页 | A4自动分页系统</div>
+    </div>'''
+
+# 单行HTML模板
+_LINE_TMPL = '            <div class="{cls}" data-line="{ld}">{txt}</div>\n'
+
+# 文档结尾的脚本和闭合标签
+_DOCUMENT_TAIL = '''
+    <script>
+        console.log('📄 A4页面容器已生成');
+        console.log('总页数:', document.querySelectorAll('.page').length);
+        console.log('页面配置:', {
+            pageSize: '794×1123px',
+            textArea: '698×972px',
+            lineHeight: '36px',
+            fontSize: '15.9pt'
+        });
+    </script>
+</body>
+</html>'''
+
+@lru_cache(maxsize=16)
+def _specialized_css(layout_config: LayoutConfig, html_config: HTMLConfig) -> str:
+    """为一组具体配置生成页面CSS，结果按配置对象缓存
     
-    def generate_debug_info(self) -> str:
-        """生成调试信息面板"""
-        if not self.html_config.show_debug_info:
-            return ""
-        
-        page_info = self.layout_config.get_page_info()
-        
-        debug_html = f'''
+    两个配置类都是不可变数据类，按字段值判等和哈希，相同配置只填一次模板，
+    之后直接返回同一个字符串。
+    """
+    mapping = {name: getattr(layout_config, name) for name in _CSS_LAYOUT_FIELDS}
+    mapping.update((name, getattr(html_config, name)) for name in _CSS_HTML_FIELDS)
+    
+    # 模板里需要计算的几个值
+    mapping['header_top'] = layout_config.margin_top - 40
+    mapping['footer_bottom'] = layout_config.margin_bottom - 40
+    mapping['text_area_border'] = html_config.border_style if html_config.show_page_borders else 'none'
+    mapping['debug_display'] = 'block' if html_config.show_debug_info else 'none'
+    
+    return _CSS_TEMPLATE.substitute(mapping)
+
+@lru_cache(maxsize=16)
+def _build_debug_info(page_info_key: tuple) -> str:
+    """生成调试信息面板模板，生成时间留作 {now} 占位符，取出后再填入"""
+    # 配置值里的花括号转义，避免被 str.format 当成占位符
+    page_info = {key: str(value).replace('{', '{{').replace('}', '}}') for key, value in page_info_key}
+    
+    return f'''
         <div class="debug-info">
             <strong>🔧 A4页面容器信息</strong><br>
             📄 页面尺寸: {page_info['page_size']}<br>
@@ -185,34 +246,54 @@ class A4PageContainer:
             📐 行高: {page_info['line_height']}<br>
             📊 第一页: {page_info['first_page_lines']}行<br>
             📊 普通页: {page_info['normal_page_lines']}行<br>
-            ⏰ 生成时间: {datetime.now().strftime('%H:%M:%S')}
+            ⏰ 生成时间: {{now}}
         </div>
         '''
+
+class A4PageContainer:
+    """A4页面容器生成器"""
+    
+    def __init__(self, layout_config: LayoutConfig = None, html_config: HTMLConfig = None):
+        self.layout_config = layout_config or LayoutConfig()
+        self.html_config = html_config or HTMLConfig()
+        # 配置不可变，CSS在创建容器时生成一次
+        self._css = self.generate_css_styles()
+    
+    def invalidate(self):
+        """替换了 layout_config / html_config 后调用，下次生成文档时重建CSS"""
+        self._css = None
+    
+    def _css_styles(self) -> str:
+        """取缓存的CSS，失效后首次访问时重建"""
+        if self._css is None:
+            self._css = self.generate_css_styles()
+        return self._css
+        
+    def generate_css_styles(self) -> str:
+        """生成页面CSS样式"""
+        return _specialized_css(self.layout_config, self.html_config)
+    
+    def generate_debug_info(self) -> str:
+        """生成调试信息面板"""
+        if not self.html_config.show_debug_info:
+            return ""
         
-        return debug_html
+        page_info = self.layout_config.get_page_info()
+        template = _build_debug_info(tuple(page_info.items()))
+        
+        return template.format(now=datetime.now().strftime('%H:%M:%S'))
     
     def generate_page_structure(self, page_number: int, total_pages: int, 
                               header_text: str = "", content: str = "") -> str:
         """生成单页结构"""
-        
-        page_html = f'''
-    <!-- 第{page_number}页 -->
-    <div class="page">
-        <div class="page-header">{header_text}</div>
-        <div class="text-area">
-{content}
-        </div>
-        <div class="page-footer">第 {page_number} 页 | 共 {total_pages} 页 | A4自动分页系统</div>
-    </div>'''
-        
-        return page_html
+        return (_PAGE_PREFIX.format(n=page_number, hdr=header_text) + content + '\n'
+                + _PAGE_SUFFIX.format(n=page_number, t=total_pages))
     
-    def generate_html_document(self, pages_content: List[Dict[str, Any]], 
-                             document_title: str = "") -> str:
-        """生成完整HTML文档"""
+    def _document_head(self, document_title: str = "") -> str:
+        """生成文档开头：样式、调试信息面板，到<body>为止"""
         
-        # 生成CSS样式
-        css_styles = self.generate_css_styles()
+        # CSS样式（创建容器时已生成）
+        css_styles = self._css_styles()
         
         # 生成调试信息
         debug_info = self.generate_debug_info()
@@ -221,45 +302,63 @@ class A4PageContainer:
         doc_title = document_title or self.html_config.title
         
         # HTML文档结构
-        html_doc = f'''<!DOCTYPE html>
-<html lang="zh-CN">
-<head>
-    <meta charset="UTF-8">
-    <meta name="viewport" content="width=device-width, initial-scale=1.0">
-    <title>{doc_title}</title>
-    <style>{css_styles}</style>
-</head>
-<body>
-{debug_info}
-'''
+        return _HEAD_OPEN + doc_title + _HEAD_STYLE + css_styles + _HEAD_CLOSE + debug_info + '\n'
+    
+    def iter_html_document(self, pages_content: List[Dict[str, Any]], 
+                           document_title: str = "", total_pages: int = None) -> Iterator[str]:
+        """逐段生成完整HTML文档，调用方可以边生成边写盘，不必拼出整篇字符串
+        
+        Args:
+            pages_content: 每页的页眉和内容
+            document_title: 文档标题
+            total_pages: 页脚显示的总页数，默认为 len(pages_content)；只渲染部分页面时传入
+        """
+        yield self._document_head(document_title)
         
         # 添加所有页面
-        total_pages = len(pages_content)
+        if total_pages is None:
+            total_pages = len(pages_content)
         for i, page_data in enumerate(pages_content, 1):
-            page_html = self.generate_page_structure(
+            yield self.generate_page_structure(
                 page_number=i,
                 total_pages=total_pages,
                 header_text=page_data.get('header', ''),
                 content=page_data.get('content', '')
             )
-            html_doc += page_html + '\n'
+            yield '\n'
         
         # 闭合标签
-        html_doc += '''
-    <script>
-        console.log('📄 A4页面容器已生成');
-        console.log('总页数:', document.querySelectorAll('.page').length);
-        console.log('页面配置:', {
-            pageSize: '794×1123px',
-            textArea: '698×972px',
-            lineHeight: '36px',
-            fontSize: '15.9pt'
-        });
-    </script>
-</body>
-</html>'''
+        yield _DOCUMENT_TAIL
+    
+    def iter_pages_from_layout(self, pages: List[Page], header_text: str = "",
+                               total_pages: int = None) -> Iterator[str]:
+        """直接从铺排结果逐段生成页面HTML，不经过每页内容字符串
         
-        return html_doc
+        输出与 generate_page_structure 逐页拼接的结果相同。
+        """
+        if total_pages is None:
+            total_pages = len(pages)
+        for page_number, page in enumerate(pages, 1):
+            yield _PAGE_PREFIX.format(n=page_number, hdr=header_text)
+            if not page.lines:
+                yield '\n'
+            for line in page.lines:
+                # 行号只加在data属性中
+                yield _LINE_TMPL.format(cls=line.css_class, ld=line.line_display, txt=line.text)
+            yield _PAGE_SUFFIX.format(n=page_number, t=total_pages)
+            yield '\n'
+    
+    def iter_layout_document(self, pages: List[Page], header_text: str = "",
+                             document_title: str = "", total_pages: int = None) -> Iterator[str]:
+        """从铺排结果逐段生成完整HTML文档"""
+        yield self._document_head(document_title)
+        yield from self.iter_pages_from_layout(pages, header_text, total_pages)
+        yield _DOCUMENT_TAIL
+    
+    def generate_html_document(self, pages_content: List[Dict[str, Any]], 
+                             document_title: str = "") -> str:
+        """生成完整HTML文档"""
+        return ''.join(self.iter_html_document(pages_content, document_title))
 
 def test_page_container():
     """测试页面容器生成"""
@@ -6,31 +6,37 @@ A4排版总装线 - 主运行程序
 
 import os
 import asyncio
+from concurrent.futures import ProcessPoolExecutor
 from playwright.async_api import async_playwright
-from markdown_parser import MarkdownParser
+from markdown_cache import parse_file_cached
 from handwritten_composer import HandwrittenComposer
 from page_container import A4PageContainer
 from config import LayoutConfig, HTMLConfig
+from generate_page_screenshot import ScreenshotPool, html_string_to_png
 
-async def generate_pdf_from_html(html_file_path, output_filename_base):
-    """
-    使用Playwright将HTML转换为PDF
-    """
-    print("🖨️  启动PDF生成器...")
-    
-    async with async_playwright() as p:
-        browser = await p.chromium.launch()
-        page = await browser.new_page()
-        
-        # 加载HTML文件
-        file_url = f"file://{os.path.abspath(html_file_path)}"
-        await page.goto(file_url)
-        
-        # 等待页面完全加载
-        await page.wait_for_timeout(2000)
+# main() 打印预览的内容块个数
+_PREVIEW_BLOCKS = 10
+
+# 每页页眉文字
+_PAGE_HEADER = 'A4排版总装线 - 测试输出'
+
+# HTML写缓冲大小：整篇文档通常只需一次write系统调用
+_HTML_WRITE_BUFFER = 4 * 1024 * 1024
+
+def _write_html(path, html):
+    """把整篇HTML编码为UTF-8写入文件（在写盘线程里编码，不占用事件循环）"""
+    with open(path, 'wb', buffering=_HTML_WRITE_BUFFER) as f:
+        f.write(html.encode('utf-8'))
+
+async def _render_pdf(browser, html_content, pdf_path):
+    """在浏览器中新开一个标签页，把HTML渲染成A4 PDF"""
+    page = await browser.new_page()
+    try:
+        # 直接把内存中的HTML交给浏览器，不经过磁盘文件
+        await page.set_content(html_content, wait_until='load')
         
-        # PDF输出路径
-        pdf_path = f"{output_filename_base}.pdf"
+        # 本地静态页面load后即可渲染，只需再等字体就绪
+        await page.evaluate("async () => { await document.fonts.ready; }")
         
         # 生成PDF，使用A4纸张规格
         await page.pdf(
@@ -44,14 +50,55 @@ async def generate_pdf_from_html(html_file_path, output_filename_base):
                 "right": "0mm"
             }
         )
-        
-        await browser.close()
-        print(f"📄 成功生成PDF文件: '{pdf_path}'")
-        return pdf_path
+    finally:
+        await page.close()
+
+async def generate_pdf_from_html(html_content, output_filename_base, browser=None):
+    """
+    使用Playwright将HTML转换为PDF
+    
+    html_content是完整的HTML文档字符串（页面样式全部内联，不依赖文件路径）。
+    
+    传入browser时复用这个已启动的浏览器（批量处理多个文档时只启动一次），
+    否则临时启动一个浏览器，用完关闭。
+    """
+    print("🖨️  启动PDF生成器...")
+    
+    # PDF输出路径
+    pdf_path = f"{output_filename_base}.pdf"
+    
+    if browser is not None:
+        await _render_pdf(browser, html_content, pdf_path)
+    else:
+        async with async_playwright() as p:
+            temp_browser = await p.chromium.launch()
+            try:
+                await _render_pdf(temp_browser, html_content, pdf_path)
+            finally:
+                await temp_browser.close()
+    
+    print(f"📄 成功生成PDF文件: '{pdf_path}'")
+    return pdf_path
 
-async def run_assembly_line(blocks_to_process, output_filename_base):
+def process_markdown(md_path):
+    """
+    解析并铺排一个Markdown文件，返回 (页面列表, 内容块数, 前几个内容块的预览)。
+    
+    纯CPU计算、不依赖共享状态，可以放进进程池并行执行。
+    只返回导出和打印需要的数据，内容块本身不传回主进程。
+    """
+    blocks = parse_file_cached(md_path)
+    pages = HandwrittenComposer().compose_document(blocks)
+    preview = [(block.type, block.text[:40]) for block in blocks[:_PREVIEW_BLOCKS]]
+    return pages, len(blocks), preview
+
+async def run_assembly_line(blocks_to_process, output_filename_base, screenshot_pool: ScreenshotPool = None,
+                            browser=None):
     """
     运行总装线，处理指定的内容块并生成HTML和PDF输出。
+    
+    传入screenshot_pool时，顺带用内存中的HTML截取第一页PNG（不再从磁盘读回HTML）。
+    传入browser时PDF生成复用该浏览器。
     """
     print(f"🏭 总装线启动，准备处理 {len(blocks_to_process)} 个内容块...")
 
@@ -61,65 +108,108 @@ async def run_assembly_line(blocks_to_process, output_filename_base):
     composer = HandwrittenComposer()
     pages = composer.compose_document(blocks_to_process)
     print(f"📄 铺排完成，生成了 {len(pages)} 页内容。")
+    
+    return await export_pages(pages, output_filename_base, screenshot_pool=screenshot_pool, browser=browser)
 
+async def export_pages(pages, output_filename_base, screenshot_pool: ScreenshotPool = None, browser=None):
+    """
+    把铺排好的页面导出为HTML和PDF（以及可选的第一页截图）。
+    """
     # --- 工位4: 喷漆与包装 ---
     # 将Page列表转换为最终的HTML文档
     print("🎨 进入A4页面容器 (A4PageContainer)...")
     
-    # 数据格式转换：将 List[Page] 转换为 List[Dict]
-    pages_content = []
-    for page in pages:
-        # 将每页的LayoutLine对象转换为HTML字符串，行号只加在data属性中
-        html_lines = []
-        for line in page.lines:
-            line_display = getattr(line, 'line_display', str(line.line_number))
-            html_lines.append(f'            <div class="{line.css_class}" data-line="{line_display}">{line.text}</div>')
-        
-        pages_content.append({
-            'header': 'A4排版总装线 - 测试输出',
-            'content': '\n'.join(html_lines)
-        })
-
+    # 铺排结果直接逐行生成HTML，不再先转换成每页的内容字符串
     container = A4PageContainer()
-    full_html = container.generate_html_document(
-        pages_content, 
-        document_title=output_filename_base
-    )
+
+    # PDF渲染需要完整文档，整篇只拼接一次，写盘也用这一个字符串
+    full_html = ''.join(container.iter_layout_document(pages, _PAGE_HEADER, document_title=output_filename_base))
 
     # --- 保存HTML文件 ---
+    # 写盘放到线程里，与截图、PDF渲染同时进行
     output_html_path = f"{output_filename_base}.html"
-    with open(output_html_path, 'w', encoding='utf-8') as f:
-        f.write(full_html)
+    write_task = asyncio.create_task(asyncio.to_thread(_write_html, output_html_path, full_html))
+    
+    try:
+        # --- 第一页预览截图：只渲染第一页，直接使用内存中的HTML（文档没有页面时跳过） ---
+        if screenshot_pool is not None and pages:
+            first_page_html = ''.join(container.iter_layout_document(
+                pages[:1], _PAGE_HEADER, document_title=output_filename_base, total_pages=len(pages)
+            ))
+            try:
+                png_path = await html_string_to_png(first_page_html, f"{output_filename_base}.png", screenshot_pool)
+                print(f"📸 成功生成第一页截图: '{png_path}'")
+            except Exception as e:
+                # 截图只是附带的预览，失败时照常生成PDF
+                print(f"⚠️  第一页截图失败，跳过预览: {e}")
         
-    print(f"✅ 成功生成HTML文件: '{output_html_path}'")
+        # --- 工位5: PDF转换与导出 ---
+        pdf_path = await generate_pdf_from_html(full_html, output_filename_base, browser=browser)
+    finally:
+        await write_task
     
-    # --- 工位5: PDF转换与导出 ---
-    pdf_path = await generate_pdf_from_html(output_html_path, output_filename_base)
+    print(f"✅ 成功生成HTML文件: '{output_html_path}'")
     
     return output_html_path, pdf_path
 
+async def run_batch(md_paths):
+    """
+    批量处理多个Markdown文件。
+    
+    解析和铺排在进程池中并行（绕开GIL），HTML/PDF导出共用一个浏览器。
+    输出文件名与Markdown文件同名。
+    """
+    loop = asyncio.get_running_loop()
+    results = []
+    
+    with ProcessPoolExecutor(max_workers=os.cpu_count()) as executor:
+        layout_futures = [loop.run_in_executor(executor, process_markdown, path) for path in md_paths]
+        
+        async with async_playwright() as p:
+            browser = await p.chromium.launch()
+            try:
+                async with ScreenshotPool(browser=browser) as pool:
+                    for md_path, future in zip(md_paths, layout_futures):
+                        pages, _, _ = await future
+                        print(f"📄 {md_path}: 铺排完成，生成了 {len(pages)} 页内容。")
+                        results.append(await export_pages(
+                            pages, os.path.splitext(md_path)[0], screenshot_pool=pool, browser=browser
+                        ))
+            finally:
+                await browser.close()
+    
+    return results
+
 async def main():
     """主函数"""
     print("--- A4排版总装线启动 ---")
     
-    # --- 工位1: 原材料分拣 ---
-    print("📦 进入Markdown解析器 (MarkdownParser)...")
-    parser = MarkdownParser()
-    all_blocks = parser.parse_file('ai_report_5000words.md')
-    print(f"🔩 成功分拣出 {len(all_blocks)} 个零件箱 (ContentBlocks)。")
+    # --- 工位1 ~ 3: 原材料分拣、核心部件组装与总装 ---
+    print("📦 进入Markdown解析器 (MarkdownParser) 与手写铺排器 (HandwrittenComposer)...")
+    # 单个文档只要几十毫秒，直接在当前进程里完成；进程池只在 run_batch 中用于并行处理多个文档
+    pages, block_count, preview = process_markdown('ai_report_5000words.md')
+    print(f"🔩 成功分拣出 {block_count} 个零件箱 (ContentBlocks)。")
+    print(f"📄 铺排完成，生成了 {len(pages)} 页内容。")
 
     # --- 处理所有内容块 (完整5000字版本) ---
-    blocks_for_processing = all_blocks  # 使用全部42个blocks
-    
-    print(f"📋 所有{len(blocks_for_processing)}个blocks预览:")
-    for i, block in enumerate(blocks_for_processing, 1):
-        print(f"  {i}. [{block.type}] {block.text[:40]}...")
-        if i >= 10:  # 只显示前10个预览
-            print(f"  ... 还有{len(blocks_for_processing)-10}个blocks")
-            break
+    print(f"📋 所有{block_count}个blocks预览:")
+    for i, (block_type, text) in enumerate(preview, 1):
+        print(f"  {i}. [{block_type}] {text}...")
+    if block_count >= _PREVIEW_BLOCKS:  # 只显示前10个预览
+        print(f"  ... 还有{block_count - _PREVIEW_BLOCKS}个blocks")
     
     # --- 运行总装线 ---
-    html_path, pdf_path = await run_assembly_line(blocks_for_processing, "A4_complete_5000words_demo")
+    # 截图和PDF共用同一个浏览器进程
+    async with async_playwright() as p:
+        browser = await p.chromium.launch()
+        try:
+            async with ScreenshotPool(max_pages=1, browser=browser) as pool:
+                html_path, pdf_path = await export_pages(
+                    pages, "A4_complete_5000words_demo",
+                    screenshot_pool=pool, browser=browser
+                )
+        finally:
+            await browser.close()
     
     print("\n--- A4排版总装线运行结束 ---")
     print(f"🏆 最终产品:")
@@ -0,0 +1,22 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+编译可选的Cython加速模块
+用法: python setup.py build_ext --inplace
+未安装Cython时跳过扩展，解析器使用纯Python实现
+"""
+
+from setuptools import setup
+
+try:
+    from Cython.Build import cythonize
+except ImportError:
+    print("⚠️ 未安装Cython，跳过编译加速模块 (pip install cython)")
+    ext_modules = []
+else:
+    ext_modules = cythonize("markdown_parser_fast.pyx", language_level=3)
+
+setup(
+    name="handwriteA4",
+    ext_modules=ext_modules,
+)